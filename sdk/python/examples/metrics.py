@@ -6,150 +6,138 @@ Example demonstrating how to retrieve sandbox metrics.
 import asyncio
 import time
 
-import aiohttp
 from microsandbox import PythonSandbox
 
 
-async def basic_metrics_example():
+async def basic_metrics_example(sandbox: PythonSandbox):
     """Example showing how to get individual metrics for a sandbox."""
     print("\n=== Basic Metrics Example ===")
 
-    # Create a sandbox using a context manager
-    async with PythonSandbox.create(name="metrics-example") as sandbox:
-        # Run a command to generate some load
-        print("Running commands to generate some sandbox activity...")
-        await sandbox.command.run("ls", ["-la", "/"])
-        await sandbox.command.run(
-            "dd", ["if=/dev/zero", "of=/tmp/testfile", "bs=1M", "count=10"]
-        )
+    # Run a command to generate some load
+    print("Running commands to generate some sandbox activity...")
+    await sandbox.command.run("ls", ["-la", "/"])
+    await sandbox.command.run(
+        "dd", ["if=/dev/zero", "of=/tmp/testfile", "bs=1M", "count=10"]
+    )
 
-        # Sleep a moment to allow metrics to update
-        time.sleep(1)
+    # Sleep a moment to allow metrics to update
+    await asyncio.sleep(1)
 
-        # Get individual metrics
-        print("\nGetting individual metrics for this sandbox:")
+    # Get individual metrics
+    print("\nGetting individual metrics for this sandbox:")
 
-        try:
-            # Get CPU usage
-            cpu = await sandbox.metrics.cpu()
-            # CPU metrics may be 0.0 when idle or None if unavailable
-            if cpu is None:
-                print("CPU Usage: Not available")
-            else:
-                print(f"CPU Usage: {cpu}%")
-
-            # Get memory usage
-            memory = await sandbox.metrics.memory()
-            print(f"Memory Usage: {memory or 'Not available'} MiB")
+    try:
+        # Get CPU, memory and disk usage and the running state concurrently
+        cpu, memory, disk, running = await asyncio.gather(
+            sandbox.metrics.cpu(),
+            sandbox.metrics.memory(),
+            sandbox.metrics.disk(),
+            sandbox.metrics.is_running(),
+        )
 
-            # Get disk usage
-            disk = await sandbox.metrics.disk()
-            print(f"Disk Usage: {disk or 'Not available'} bytes")
+        # CPU metrics may be 0.0 when idle or None if unavailable
+        if cpu is None:
+            print("CPU Usage: Not available")
+        else:
+            print(f"CPU Usage: {cpu}%")
 
-            # Check if running
-            running = await sandbox.metrics.is_running()
-            print(f"Is Running: {running}")
-        except RuntimeError as e:
-            print(f"Error getting metrics: {e}")
+        print(f"Memory Usage: {memory or 'Not available'} MiB")
+        print(f"Disk Usage: {disk or 'Not available'} bytes")
+        print(f"Is Running: {running}")
+    except RuntimeError as e:
+        print(f"Error getting metrics: {e}")
 
 
-async def all_metrics_example():
+async def all_metrics_example(sandbox: PythonSandbox):
     """Example showing how to get all metrics at once."""
     print("\n=== All Metrics Example ===")
 
-    # Create a sandbox
-    async with PythonSandbox.create(name="all-metrics-example") as sandbox:
-        try:
-            # Run some commands to generate activity
-            print("Running commands to generate some sandbox activity...")
-            await sandbox.command.run("cat", ["/etc/os-release"])
-            # Using a simpler command that won't time out or cause errors
-            await sandbox.command.run("ls", ["-la", "/usr"])
-
-            # Sleep a moment to allow metrics to update
-            time.sleep(1)
-
-            # Get all metrics at once
-            print("\nGetting all metrics as a dictionary:")
-            all_metrics = await sandbox.metrics.all()
-
-            # Print formatted metrics
-            print(f"Sandbox: {all_metrics.get('name')}")
-            print(f"  Running: {all_metrics.get('running')}")
-
-            # Handle CPU metrics which may be 0.0 or None
-            cpu = all_metrics.get("cpu_usage")
-            if cpu is None:
-                print("  CPU Usage: Not available")
-            else:
-                print(f"  CPU Usage: {cpu}%")
+    try:
+        # Run some commands to generate activity
+        print("Running commands to generate some sandbox activity...")
+        await sandbox.command.run("cat", ["/etc/os-release"])
+        # Using a simpler command that won't time out or cause errors
+        await sandbox.command.run("ls", ["-la", "/usr"])
 
-            print(
-                f"  Memory Usage: {all_metrics.get('memory_usage') or 'Not available'} MiB"
-            )
-            print(
-                f"  Disk Usage: {all_metrics.get('disk_usage') or 'Not available'} bytes"
-            )
-        except Exception as e:
-            print(f"Error in all_metrics_example: {e}")
+        # Sleep a moment to allow metrics to update
+        await asyncio.sleep(1)
+
+        # Get all metrics at once
+        print("\nGetting all metrics as a dictionary:")
+        all_metrics = await sandbox.metrics.all()
 
+        # Print formatted metrics
+        print(f"Sandbox: {all_metrics.get('name')}")
+        print(f"  Running: {all_metrics.get('running')}")
 
-async def continuous_monitoring_example():
+        # Handle CPU metrics which may be 0.0 or None
+        cpu = all_metrics.get("cpu_usage")
+        if cpu is None:
+            print("  CPU Usage: Not available")
+        else:
+            print(f"  CPU Usage: {cpu}%")
+
+        print(
+            f"  Memory Usage: {all_metrics.get('memory_usage') or 'Not available'} MiB"
+        )
+        print(f"  Disk Usage: {all_metrics.get('disk_usage') or 'Not available'} bytes")
+    except Exception as e:
+        print(f"Error in all_metrics_example: {e}")
+
+
+async def continuous_monitoring_example(sandbox: PythonSandbox):
     """Example showing how to continuously monitor sandbox metrics."""
     print("\n=== Continuous Monitoring Example ===")
 
-    # Create a sandbox
-    async with PythonSandbox.create(name="monitoring-example") as sandbox:
-        try:
-            print("Starting continuous monitoring (5 seconds)...")
-
-            # Generate load with a simple and safe command
-            _ = await sandbox.command.run(
-                "sh",
-                [
-                    "-c",
-                    "for i in $(seq 1 5); do ls -la / > /dev/null; sleep 0.2; done &",
-                ],
-            )
+    try:
+        print("Starting continuous monitoring (5 seconds)...")
+
+        # Generate load with a simple and safe command
+        _ = await sandbox.command.run(
+            "sh",
+            [
+                "-c",
+                "for i in $(seq 1 5); do ls -la / > /dev/null; sleep 0.2; done &",
+            ],
+        )
 
-            # Monitor for 5 seconds
-            start_time = time.time()
-            while time.time() - start_time < 5:
-                try:
-                    # Get metrics
-                    cpu = await sandbox.metrics.cpu()
-                    memory = await sandbox.metrics.memory()
+        # Monitor for 5 seconds
+        start_time = time.time()
+        while time.time() - start_time < 5:
+            # Request metrics, then wait out the tick while the request is in flight
+            pending = asyncio.create_task(sandbox.metrics.all())
+            await asyncio.sleep(1)
 
-                    # Format CPU usage (could be 0.0 or None)
-                    cpu_str = f"{cpu}%" if cpu is not None else "Not available"
+            try:
+                all_metrics = await pending
+                cpu = all_metrics.get("cpu_usage")
+                memory = all_metrics.get("memory_usage")
 
-                    # Print current values
-                    print(
-                        f"[{time.time() - start_time:.1f}s] CPU: {cpu_str}, Memory: {memory or 'Not available'} MiB"
-                    )
-                except Exception as e:
-                    print(f"Error getting metrics: {e}")
+                # Format CPU usage (could be 0.0 or None)
+                cpu_str = f"{cpu}%" if cpu is not None else "Not available"
 
-                # Wait before next check
-                await asyncio.sleep(1)
+                # Print current values
+                print(
+                    f"[{time.time() - start_time:.1f}s] CPU: {cpu_str}, Memory: {memory or 'Not available'} MiB"
+                )
+            except Exception as e:
+                print(f"Error getting metrics: {e}")
 
-            print("Monitoring complete.")
-        except Exception as e:
-            print(f"Error in continuous_monitoring_example: {e}")
+        print("Monitoring complete.")
+    except Exception as e:
+        print(f"Error in continuous_monitoring_example: {e}")
 
 
-async def cpu_load_test_example():
+async def cpu_load_test_example(sandbox: PythonSandbox):
     """Example generating CPU load to test CPU metrics."""
     print("\n=== CPU Load Test Example ===")
 
-    # Create a sandbox
-    async with PythonSandbox.create(name="cpu-load-test") as sandbox:
-        try:
-            # Run a CPU-intensive Python script
-            print("Running CPU-intensive task...")
+    try:
+        # Run a CPU-intensive Python script
+        print("Running CPU-intensive task...")
 
-            # First create a Python script that will use CPU
-            cpu_script = """
+        # First create a Python script that will use CPU
+        cpu_script = """
 import time
 start = time.time()
 duration = 10  # seconds
@@ -171,36 +159,39 @@ while time.time() - start < duration:
 
 print("CPU load test complete")
 """
-            # Write the script to a file
-            await sandbox.command.run(
-                "bash", ["-c", f"cat > /tmp/cpu_test.py << 'EOF'\n{cpu_script}\nEOF"]
-            )
-
-            # Run the script in the background
-            print("Starting CPU test (running for 10 seconds)...")
-            await sandbox.command.run("python", ["/tmp/cpu_test.py", "&"])
+        # Write the script to a file and start it in the background with a
+        # single command, so it costs one round trip to the server
+        print("Starting CPU test (running for 10 seconds)...")
+        await sandbox.command.run(
+            "bash",
+            [
+                "-c",
+                f"cat > /tmp/cpu_test.py << 'EOF'\n{cpu_script}\nEOF\n"
+                "python /tmp/cpu_test.py > /dev/null 2>&1 &",
+            ],
+        )
 
-            # Monitor CPU usage while the script runs
-            print("\nMonitoring CPU usage...")
-            for i in range(5):
-                # Wait a moment
-                await asyncio.sleep(2)
+        # Monitor CPU usage while the script runs
+        print("\nMonitoring CPU usage...")
+        for i in range(5):
+            # Wait a moment
+            await asyncio.sleep(2)
 
-                # Get metrics
-                cpu = await sandbox.metrics.cpu()
-                memory = await sandbox.metrics.memory()
+            # Get metrics
+            cpu = await sandbox.metrics.cpu()
+            memory = await sandbox.metrics.memory()
 
-                # Format CPU usage (could be 0.0 or None)
-                cpu_str = f"{cpu}%" if cpu is not None else "Not available"
+            # Format CPU usage (could be 0.0 or None)
+            cpu_str = f"{cpu}%" if cpu is not None else "Not available"
 
-                # Print current values
-                print(
-                    f"[{i * 2} seconds] CPU: {cpu_str}, Memory: {memory or 'Not available'} MiB"
-                )
+            # Print current values
+            print(
+                f"[{i * 2} seconds] CPU: {cpu_str}, Memory: {memory or 'Not available'} MiB"
+            )
 
-            print("CPU load test complete.")
-        except Exception as e:
-            print(f"Error in cpu_load_test_example: {e}")
+        print("CPU load test complete.")
+    except Exception as e:
+        print(f"Error in cpu_load_test_example: {e}")
 
 
 async def error_handling_example():
@@ -219,24 +210,16 @@ async def error_handling_example():
         print(f"Expected error: {e}")
 
     try:
-        # Now properly start the sandbox
+        # Now properly start the sandbox; create() also stops it when done
         print("\nStarting the sandbox properly...")
-        sandbox._session = aiohttp.ClientSession()
-        await sandbox.start()
-
-        # Get metrics after starting
-        cpu = await sandbox.metrics.cpu()
-        # Format CPU usage (could be 0.0 or None)
-        cpu_str = f"{cpu}%" if cpu is not None else "Not available"
-        print(f"CPU usage after starting: {cpu_str}")
+        async with PythonSandbox.create(name="error-example") as sandbox:
+            # Get metrics after starting
+            cpu = await sandbox.metrics.cpu()
+            # Format CPU usage (could be 0.0 or None)
+            cpu_str = f"{cpu}%" if cpu is not None else "Not available"
+            print(f"CPU usage after starting: {cpu_str}")
     except Exception as e:
         print(f"Error: {e}")
-    finally:
-        # Clean up
-        if sandbox._is_started:
-            await sandbox.stop()
-        if sandbox._session and not sandbox._session.closed:
-            await sandbox._session.close()
 
 
 async def main():
@@ -244,14 +227,21 @@ async def main():
     print("Sandbox Metrics Examples")
     print("=======================")
 
-    try:
-        await basic_metrics_example()
-        await all_metrics_example()
-        await continuous_monitoring_example()
-        await cpu_load_test_example()
-        await error_handling_example()
-    except Exception as e:
-        print(f"Error in main: {e}")
+    # The metrics examples only read from the sandbox, so they share one and run
+    # concurrently; the error handling example manages its own. Sandboxes for the
+    # same server share a connection pool.
+    async with PythonSandbox.create(name="metrics-examples") as sandbox:
+        results = await asyncio.gather(
+            basic_metrics_example(sandbox),
+            all_metrics_example(sandbox),
+            continuous_monitoring_example(sandbox),
+            cpu_load_test_example(sandbox),
+            error_handling_example(),
+            return_exceptions=True,
+        )
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Error in main: {result}")
 
     print("\nAll examples completed!")
 
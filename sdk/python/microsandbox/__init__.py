@@ -4,12 +4,14 @@ Microsandbox Python SDK
 
 __version__ = "0.1.0"
 
+from ._observer import set_rpc_observer
 from .base_sandbox import BaseSandbox
 from .command import Command
 from .command_execution import CommandExecution
 from .execution import Execution
 from .metrics import Metrics
 from .node_sandbox import NodeSandbox
+from .pool import SandboxPool
 from .python_sandbox import PythonSandbox
 
 __all__ = [
@@ -20,4 +22,6 @@ __all__ = [
     "CommandExecution",
     "Command",
     "Metrics",
+    "SandboxPool",
+    "set_rpc_observer",
 ]
@@ -0,0 +1,170 @@
+"""
+Shared HTTP sessions for the Microsandbox Python SDK.
+
+Sandboxes created without an explicit session share one aiohttp session per event loop
+and server, so concurrent sandboxes reuse the same connection pool. A shared session is
+closed when the last sandbox using it releases it.
+"""
+
+import asyncio
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+
+class _SharedSession:
+    """
+    A shared HTTP session along with the number of sandboxes using it.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.users = 0
+
+
+# Shared sessions keyed by event loop and server
+_sessions: Dict[Tuple[asyncio.AbstractEventLoop, str], _SharedSession] = {}
+
+
+def _session_key(
+    server_url: str, socket_path: Optional[str]
+) -> Tuple[asyncio.AbstractEventLoop, str]:
+    return asyncio.get_running_loop(), socket_path or server_url
+
+
+def _create_session(socket_path: Optional[str]) -> aiohttp.ClientSession:
+    """
+    Create a new HTTP session for talking to a Microsandbox server.
+
+    Args:
+        socket_path: Path of the server's Unix domain socket, or None to use TCP
+
+    Returns:
+        A new aiohttp session
+    """
+    # Keep idle connections and DNS results around long enough to be
+    # reused between the start, the first command and later calls
+    if socket_path:
+        connector = aiohttp.UnixConnector(
+            path=socket_path, limit=0, limit_per_host=128, keepalive_timeout=120
+        )
+    else:
+        connector = aiohttp.TCPConnector(
+            limit=0,
+            limit_per_host=128,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            keepalive_timeout=120,
+        )
+    return aiohttp.ClientSession(
+        connector=connector,
+        # The server doesn't use cookies, so skip cookie parsing and storage
+        cookie_jar=aiohttp.DummyCookieJar(),
+        # Commands can legitimately run for a long time, so bound connecting and
+        # silence on the socket rather than the total request time
+        timeout=aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=300),
+        # A larger read buffer means fewer reads for big execution outputs
+        read_bufsize=256 * 1024,
+    )
+
+
+async def warm_up(
+    session: aiohttp.ClientSession, server_url: str, connections: int
+) -> None:
+    """
+    Open connections to a server ahead of time by sending concurrent health checks.
+
+    This is only worth it before a burst of concurrent requests, such as when a pool of
+    sandboxes is about to be used. Failures are ignored; the connections are simply
+    opened on demand instead.
+
+    Args:
+        session: The session whose connection pool to fill
+        server_url: Base URL of the Microsandbox server
+        connections: Number of connections to open
+    """
+
+    async def ping() -> None:
+        try:
+            async with session.head(f"{server_url}/api/v1/health"):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    await asyncio.gather(*(ping() for _ in range(connections)))
+
+
+def acquire_session(
+    server_url: str, socket_path: Optional[str] = None
+) -> aiohttp.ClientSession:
+    """
+    Get the shared HTTP session for a server, creating it if needed.
+
+    Every call must be paired with a call to release_session() once the session is no
+    longer needed.
+
+    Args:
+        server_url: Base URL of the Microsandbox server
+        socket_path: Path of the server's Unix domain socket, if any
+
+    Returns:
+        The shared aiohttp session for the server
+    """
+    key = _session_key(server_url, socket_path)
+    shared = _sessions.get(key)
+    if shared is None or shared.session.closed:
+        shared = _sessions[key] = _SharedSession(_create_session(socket_path))
+
+    shared.users += 1
+    return shared.session
+
+
+async def release_session(server_url: str, socket_path: Optional[str] = None) -> None:
+    """
+    Release a session obtained from acquire_session(), closing it if it is no longer used.
+
+    Args:
+        server_url: Base URL of the Microsandbox server
+        socket_path: Path of the server's Unix domain socket, if any
+    """
+    key = _session_key(server_url, socket_path)
+    shared = _sessions.get(key)
+    if shared is None:
+        return
+
+    shared.users -= 1
+    if shared.users > 0:
+        return
+
+    del _sessions[key]
+    await shared.session.close()
+
+
+async def read_capped(response: aiohttp.ClientResponse, max_bytes: int) -> bytearray:
+    """
+    Read a response body, refusing bodies larger than a limit.
+
+    The body is read in chunks so an oversized response is rejected as soon as it
+    crosses the limit rather than after it has been fully buffered.
+
+    Args:
+        response: The response to read
+        max_bytes: Maximum number of bytes to accept
+
+    Returns:
+        The response body
+
+    Raises:
+        ValueError: If the body is larger than max_bytes
+    """
+    if response.content_length is not None and response.content_length > max_bytes:
+        raise ValueError(
+            f"Response body of {response.content_length} bytes exceeds the limit of {max_bytes} bytes"
+        )
+
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(64 * 1024):
+        body += chunk
+        if len(body) > max_bytes:
+            raise ValueError(f"Response body exceeds the limit of {max_bytes} bytes")
+    return body
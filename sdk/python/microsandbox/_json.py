@@ -0,0 +1,53 @@
+"""
+JSON encoding helpers for the Microsandbox Python SDK.
+
+Uses orjson when it is installed and falls back to the standard library otherwise.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize an object to compact JSON bytes.
+
+    Args:
+        obj: The object to serialize
+
+    Returns:
+        The UTF-8 encoded JSON document
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson rejects some valid str values, such as lone surrogates, that the
+            # standard library escapes; anything else fails there as well
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+def loads(data: bytes) -> Any:
+    """
+    Deserialize a JSON document.
+
+    Args:
+        data: The JSON document as bytes or str
+
+    Returns:
+        The deserialized object
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            # orjson rejects escaped lone surrogates, which the standard library
+            # accepts; truly invalid documents fail there as well
+            pass
+    return json.loads(data)
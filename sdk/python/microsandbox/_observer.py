@@ -0,0 +1,33 @@
+"""
+Client-side RPC instrumentation for the Microsandbox Python SDK.
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+# Called with a dictionary describing each RPC attempt:
+# {
+#     "method": str,
+#     "dur": float,                 # seconds from sending the request to reading the response
+#     "req_bytes": int,
+#     "resp_bytes": int,
+#     "status": Optional[int],      # None if no response was received
+#     "rpc_error": Optional[int],   # JSON-RPC error code, if the server returned an error
+# }
+RpcObserver = Callable[[Dict[str, Any]], None]
+
+_on_rpc: Optional[RpcObserver] = None
+
+
+def set_rpc_observer(observer: Optional[RpcObserver]) -> None:
+    """
+    Set the function called after every RPC attempt made by any sandbox.
+
+    The observer runs on the event loop after each attempt, including retried ones, so
+    it should be fast and must not raise. No timing is done while no observer is set.
+
+    Args:
+        observer: Function called with a dictionary describing the attempt, or None to
+            remove the current observer
+    """
+    global _on_rpc
+    _on_rpc = observer
@@ -3,18 +3,104 @@ Base sandbox implementation for the Microsandbox Python SDK.
 """
 
 import asyncio
+import functools
+import itertools
 import os
-import uuid
+import random
+import secrets
+import time
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import Dict, List, Optional
+from types import MappingProxyType
+from typing import Any, Dict, List, Optional, Union
 
 import aiohttp
 from dotenv import load_dotenv
 
+from . import _http, _json, _observer
 from .command import Command
+from .execution import Execution
 from .metrics import Metrics
 
+# Number of attempts and initial backoff delay in seconds for idempotent requests
+_RETRY_ATTEMPTS = 3
+_RETRY_BASE_DELAY = 0.05
+
+# HTTP statuses returned while the server, or a proxy in front of it, is briefly unavailable
+_RETRY_STATUSES = frozenset((502, 503, 504))
+
+# Largest JSON-RPC response body accepted from the server, in bytes
+_MAX_RESPONSE_SIZE = 64 * 1024 * 1024
+
+# Number of bytes of an error response body included in exception messages
+_MAX_ERROR_TEXT = 512
+
+_dotenv_loaded = False
+
+
+def _load_dotenv_once() -> None:
+    """
+    Load variables from a .env file the first time a sandbox needs them.
+
+    The file is only read when MSB_API_KEY is not already set, and at most once per process.
+    """
+    global _dotenv_loaded
+    if _dotenv_loaded:
+        return
+    _dotenv_loaded = True
+
+    # Only try to load .env if MSB_API_KEY is not already set
+    if "MSB_API_KEY" not in os.environ:
+        # Ignore errors if .env file doesn't exist
+        try:
+            load_dotenv()
+        except Exception:
+            pass
+
+
+@functools.lru_cache(maxsize=16)
+def _start_timeout(timeout: float) -> aiohttp.ClientTimeout:
+    """
+    Get the client timeout used for sandbox.start requests.
+
+    The client-side timeout is a bit longer than the server-side timeout to account for
+    network latency and processing time, but connecting fails fast if the server can't
+    be reached at all. Results are cached since most callers reuse the same timeout.
+
+    Args:
+        timeout: Server-side start timeout in seconds
+
+    Returns:
+        The client timeout to use for the request
+    """
+    return aiohttp.ClientTimeout(total=timeout + 30, sock_connect=5)
+
+
+@functools.lru_cache(maxsize=None)
+def _request_prefix(method: str) -> bytes:
+    """
+    Get the encoded start of a JSON-RPC request envelope, up to its params.
+
+    Args:
+        method: Name of the JSON-RPC method to call
+
+    Returns:
+        The envelope bytes that precede the encoded params
+    """
+    return b'{"jsonrpc":"2.0","method":' + _json.dumps(method) + b',"params":'
+
+
+async def _backoff(attempt: int) -> None:
+    """
+    Wait before retrying a request, using exponential backoff with jitter.
+
+    Args:
+        attempt: Zero-based number of the attempt that just failed
+    """
+    await asyncio.sleep(
+        _RETRY_BASE_DELAY * 2**attempt + random.random() * _RETRY_BASE_DELAY
+    )
+
 
 class BaseSandbox(ABC):
     """
@@ -29,33 +115,259 @@ class BaseSandbox(ABC):
         server_url: str = None,
         name: Optional[str] = None,
         api_key: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        retry_runs: bool = False,
     ):
         """
         Initialize a base sandbox instance.
 
         Args:
-            server_url: URL of the Microsandbox server. If not provided, will check MSB_SERVER_URL environment variable, then fall back to default.
+            server_url: URL of the Microsandbox server, or unix:///path/to.sock for a Unix domain socket. If not provided, will check MSB_SERVER_URL environment variable, then fall back to default.
             name: Optional name for the sandbox. If not provided, a random name will be generated.
             api_key: API key for Microsandbox server authentication. If not provided, it will be read from MSB_API_KEY environment variable.
+            session: Optional aiohttp session to use for requests. When provided, the caller owns it and is responsible for closing it, and with a unix:// server URL it must use an aiohttp.UnixConnector for that socket.
+            retry_runs: Whether to retry code and command runs after transient network errors. Off by default, since a retried run may execute more than once.
+
+        Raises:
+            ValueError: If a session is given for a unix:// server URL without a Unix socket connector
         """
-        # Only try to load .env if MSB_API_KEY is not already set
-        if "MSB_API_KEY" not in os.environ:
-            # Ignore errors if .env file doesn't exist
-            try:
-                load_dotenv()
-            except Exception:
-                pass
+        _load_dotenv_once()
 
         self._server_url = server_url or os.environ.get(
             "MSB_SERVER_URL", "http://127.0.0.1:5555"
         )
-        self._name = name or f"sandbox-{uuid.uuid4().hex[:8]}"
+        # A unix:// URL points at a Unix domain socket; requests are then sent over
+        # that socket with a placeholder host in the HTTP URL
+        self._socket_path = None
+        if self._server_url.startswith("unix://"):
+            self._socket_path = self._server_url[len("unix://") :]
+            self._server_url = "http://localhost"
+            # A TCP session would send requests to the placeholder host instead
+            if session is not None and not isinstance(
+                session.connector, aiohttp.UnixConnector
+            ):
+                raise ValueError(
+                    f"A session for unix://{self._socket_path} must use an "
+                    "aiohttp.UnixConnector"
+                )
+        self._name = name or f"sandbox-{secrets.token_hex(4)}"
         self._api_key = api_key or os.environ.get("MSB_API_KEY")
-        self._session = None
+        # Request headers and the RPC endpoint are the same for every call, so build
+        # them once; the headers are read-only since they are shared by all requests
+        headers = {"Content-Type": "application/json"}
+        if self._api_key:
+            headers["Authorization"] = f"Bearer {self._api_key}"
+        self._headers = MappingProxyType(headers)
+        self._rpc_url = f"{self._server_url}/api/v1/rpc"
+        # Params of the calls that only name the sandbox, encoded once
+        self._sandbox_params = _json.dumps({"sandbox": self._name})
+        self._repl_prefixes: Dict[str, bytes] = {}
+        self._session = session
+        self._owns_session = session is None
+        self._retry_runs = retry_runs
         self._is_started = False
+        self._lifecycle_lock = None
+        self._rpc_ids = itertools.count(1)
+        self._metrics = None
+
+    def _get_lifecycle_lock(self) -> asyncio.Lock:
+        """
+        Get the lock that serializes start() and stop() calls.
+
+        The lock is created lazily so that it belongs to the running event loop.
+
+        Returns:
+            The lifecycle lock for this sandbox
+        """
+        if self._lifecycle_lock is None:
+            self._lifecycle_lock = asyncio.Lock()
+        return self._lifecycle_lock
+
+    def _make_rpc(self, method: str, params: Union[dict, bytes]) -> bytes:
+        """
+        Build an encoded JSON-RPC request envelope.
+
+        The envelope is spliced together from a cached prefix for the method, the
+        params and the request id. Request ids only need to be unique per sandbox,
+        so a simple counter is used.
+
+        Args:
+            method: Name of the JSON-RPC method to call
+            params: Parameters for the method, either as a dictionary or already encoded as JSON
+
+        Returns:
+            The JSON request body
+        """
+        if not isinstance(params, bytes):
+            params = _json.dumps(params)
+        return _request_prefix(method) + params + b',"id":%d}' % next(self._rpc_ids)
+
+    def _repl_params(self, language: str, code: str) -> bytes:
+        """
+        Encode the params of a sandbox.repl.run call.
+
+        Everything but the code is the same for every call in a given language, so
+        that part is encoded once and the code is appended to it.
+
+        Args:
+            language: Language of the REPL to run the code in
+            code: Code to execute
+
+        Returns:
+            The params encoded as JSON
+        """
+        prefix = self._repl_prefixes.get(language)
+        if prefix is None:
+            # Encode with an empty code string, then cut off its '""}'
+            prefix = _json.dumps(
+                {"sandbox": self._name, "language": language, "code": ""}
+            )[:-3]
+            self._repl_prefixes[language] = prefix
+        return prefix + _json.dumps(code) + b"}"
+
+    async def _run_repl(self, language: str, code: str) -> Execution:
+        """
+        Execute code in one of the sandbox's language REPLs.
+
+        Args:
+            language: Language of the REPL to run the code in
+            code: Code to execute
+
+        Returns:
+            An Execution object that represents the executed code
+
+        Raises:
+            RuntimeError: If the sandbox is not started or execution fails
+        """
+        if not self._is_started:
+            raise RuntimeError("Sandbox is not started. Call start() first.")
+
+        result = await self._rpc(
+            "sandbox.repl.run",
+            self._repl_params(language, code),
+            "Failed to execute code",
+            idempotent=self._retry_runs,
+        )
+
+        # Create and return an Execution object with the output data
+        return Execution(output_data=result)
+
+    async def _rpc(
+        self,
+        method: str,
+        params: Union[dict, bytes],
+        error_message: str,
+        timeout: Optional[aiohttp.ClientTimeout] = None,
+        idempotent: bool = False,
+        raise_timeouts: bool = False,
+    ) -> Any:
+        """
+        Call a JSON-RPC method on the Microsandbox server.
+
+        Args:
+            method: Name of the JSON-RPC method to call
+            params: Parameters for the method, either as a dictionary or already encoded as JSON
+            error_message: Prefix for the message of any RuntimeError raised by the call
+            timeout: Optional client timeout to use instead of the session default
+            idempotent: Whether the call is safe to repeat. Idempotent calls are retried
+                with exponential backoff when the connection fails, the request times
+                out, or the server responds with 502, 503 or 504.
+            raise_timeouts: Whether to raise timeouts as asyncio.TimeoutError for the caller
+                to report, instead of as RuntimeError
+
+        Returns:
+            The result of the JSON-RPC call
+
+        Raises:
+            RuntimeError: If the request fails or the server returns an error
+            asyncio.TimeoutError: If the request times out and raise_timeouts is set
+        """
+        body = self._make_rpc(method, params)
+        # Only override the session's timeout when one is given
+        options = {} if timeout is None else {"timeout": timeout}
+        attempts = _RETRY_ATTEMPTS if idempotent else 1
+
+        for attempt in range(attempts):
+            if attempt:
+                # Wait out the previous failure before trying again
+                await _backoff(attempt - 1)
+
+            can_retry = attempt + 1 < attempts
+            # Only time the attempt when someone is listening
+            observer = _observer._on_rpc
+            if observer is not None:
+                started = time.perf_counter()
+                status = None
+                resp_bytes = 0
+                error = None
+            try:
+                async with self._session.post(
+                    self._rpc_url,
+                    data=body,
+                    headers=self._headers,
+                    **options,
+                ) as response:
+                    status = response.status
+                    resp_bytes = response.content_length or 0
+                    if status in _RETRY_STATUSES and can_retry:
+                        continue
+                    if status != 200:
+                        raw = await response.read()
+                        resp_bytes = len(raw)
+                        if observer is not None:
+                            # The server also reports JSON-RPC errors with non-200
+                            # statuses, e.g. unknown methods
+                            try:
+                                error = _json.loads(raw).get("error")
+                            except (ValueError, AttributeError):
+                                pass
+                        error_text = raw[:_MAX_ERROR_TEXT].decode(errors="replace")
+                        raise RuntimeError(
+                            f"{error_message}: HTTP {status} {error_text}"
+                        )
+
+                    try:
+                        raw = await _http.read_capped(response, _MAX_RESPONSE_SIZE)
+                        resp_bytes = len(raw)
+                        response_data = _json.loads(raw)
+                    except ValueError as e:
+                        raise RuntimeError(
+                            f"{error_message}: invalid response: {e}"
+                        ) from e
+                    error = response_data.get("error")
+                    if error is not None:
+                        raise RuntimeError(f"{error_message}: {error['message']}")
+
+                    return response_data.get("result", {})
+            except asyncio.TimeoutError as e:
+                if not can_retry:
+                    if raise_timeouts:
+                        raise
+                    raise RuntimeError(f"{error_message}: request timed out") from e
+            except aiohttp.ClientConnectionError as e:
+                # The connection failed or was dropped, e.g. a stale keep-alive connection
+                if not can_retry:
+                    raise RuntimeError(f"{error_message}: {e}") from e
+            except aiohttp.ClientError as e:
+                raise RuntimeError(f"{error_message}: {e}") from e
+            finally:
+                if observer is not None:
+                    observer(
+                        {
+                            "method": method,
+                            "dur": time.perf_counter() - started,
+                            "req_bytes": len(body),
+                            "resp_bytes": resp_bytes,
+                            "status": status,
+                            "rpc_error": (
+                                error.get("code") if isinstance(error, dict) else None
+                            ),
+                        }
+                    )
 
+    @classmethod
     @abstractmethod
-    async def get_default_image(self) -> str:
+    def get_default_image(cls) -> str:
         """
         Get the default Docker image for this sandbox type.
 
@@ -71,44 +383,55 @@ class BaseSandbox(ABC):
         server_url: str = None,
         name: Optional[str] = None,
         api_key: Optional[str] = None,
+        session: Optional[aiohttp.ClientSession] = None,
+        retry_runs: bool = False,
     ):
         """
         Create and initialize a new sandbox as an async context manager.
 
         Args:
-            server_url: URL of the Microsandbox server. If not provided, will check MSB_SERVER_URL environment variable, then fall back to default.
+            server_url: URL of the Microsandbox server, or unix:///path/to.sock for a Unix domain socket. If not provided, will check MSB_SERVER_URL environment variable, then fall back to default.
             name: Optional name for the sandbox. If not provided, a random name will be generated.
             api_key: API key for Microsandbox server authentication. If not provided, it will be read from MSB_API_KEY environment variable.
+            session: Optional aiohttp session to use for requests. When provided, the caller owns it and is responsible for closing it, and with a unix:// server URL it must use an aiohttp.UnixConnector for that socket.
+            retry_runs: Whether to retry code and command runs after transient network errors. Off by default, since a retried run may execute more than once.
 
         Returns:
             An instance of the sandbox ready for use
         """
-        # Only try to load .env if MSB_API_KEY is not already set
-        if "MSB_API_KEY" not in os.environ:
-            # Ignore errors if .env file doesn't exist
-            try:
-                load_dotenv()
-            except Exception:
-                pass
-
         sandbox = cls(
             server_url=server_url,
             name=name,
             api_key=api_key,
+            session=session,
+            retry_runs=retry_runs,
         )
+        sandbox._acquire_session()
         try:
-            # Create HTTP session
-            sandbox._session = aiohttp.ClientSession()
             # Start the sandbox
             await sandbox.start()
             yield sandbox
         finally:
-            # Stop the sandbox
-            await sandbox.stop()
-            # Close the HTTP session
-            if sandbox._session:
-                await sandbox._session.close()
-                sandbox._session = None
+            try:
+                # Stop the sandbox
+                await sandbox.stop()
+            finally:
+                await sandbox._release_session()
+
+    def _acquire_session(self) -> None:
+        """
+        Use the shared HTTP session for this server unless the caller supplied one.
+        """
+        if self._session is None:
+            self._session = _http.acquire_session(self._server_url, self._socket_path)
+
+    async def _release_session(self) -> None:
+        """
+        Release the shared HTTP session if this sandbox acquired it.
+        """
+        if self._owns_session and self._session is not None:
+            await _http.release_session(self._server_url, self._socket_path)
+            self._session = None
 
     async def start(
         self,
@@ -146,78 +469,53 @@ class BaseSandbox(ABC):
             RuntimeError: If the sandbox fails to start
             TimeoutError: If the sandbox doesn't start within the specified timeout
         """
-        if self._is_started:
-            return
-
-        sandbox_image = image or await self.get_default_image()
-        config = {
-            "image": sandbox_image,
-            "memory": memory,
-            "cpus": int(round(cpus)),
-        }
-        if volumes is not None:
-            config["volumes"] = volumes
-        if ports is not None:
-            config["ports"] = ports
-        if envs is not None:
-            config["envs"] = envs
-        if depends_on is not None:
-            config["depends_on"] = depends_on
-        if workdir is not None:
-            config["workdir"] = workdir
-        if shell is not None:
-            config["shell"] = shell
-        if scripts is not None:
-            config["scripts"] = scripts
-        if exec is not None:
-            config["exec"] = exec
-
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "sandbox.start",
-            "params": {
-                "sandbox": self._name,
-                "config": config,
-            },
-        }
+        async with self._get_lifecycle_lock():
+            if self._is_started:
+                return
+
+            sandbox_image = image or self.get_default_image()
+            optional = (
+                ("volumes", volumes),
+                ("ports", ports),
+                ("envs", envs),
+                ("depends_on", depends_on),
+                ("workdir", workdir),
+                ("shell", shell),
+                ("scripts", scripts),
+                ("exec", exec),
+            )
+            config = {
+                "image": sandbox_image,
+                "memory": memory,
+                "cpus": int(round(cpus)),
+                # Only send the optional settings that were provided
+                **{key: value for key, value in optional if value is not None},
+            }
+
+            params = {"sandbox": self._name, "config": config}
 
-        headers = {"Content-Type": "application/json"}
-        if self._api_key:
-            headers["Authorization"] = f"Bearer {self._api_key}"
-
-        try:
-            # Set a client-side timeout that's a bit longer than the server-side timeout
-            # to account for network latency and processing time
-            client_timeout = aiohttp.ClientTimeout(total=timeout + 30)
-
-            async with self._session.post(
-                f"{self._server_url}/api/v1/sandbox/start",
-                json=request_data,
-                headers=headers,
-                timeout=client_timeout,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Failed to start sandbox: {error_text}")
-
-                response_data = await response.json()
-
-                # Check the message - it might indicate the sandbox is still initializing
-                message = response_data.get("message", "")
-                if isinstance(message, str) and "timed out waiting" in message:
-                    # Server timed out but still started the sandbox
-                    # We'll raise a warning but still consider it started
-                    import warnings
-
-                    warnings.warn(f"Sandbox start warning: {message}")
-
-                self._is_started = True
-        except aiohttp.ClientError as e:
-            if isinstance(e, asyncio.TimeoutError):
+            try:
+                result = await self._rpc(
+                    "sandbox.start",
+                    params,
+                    "Failed to start sandbox",
+                    timeout=_start_timeout(timeout),
+                    raise_timeouts=True,
+                )
+            except asyncio.TimeoutError as e:
                 raise TimeoutError(
                     f"Timed out waiting for sandbox to start after {timeout} seconds"
                 ) from e
-            raise RuntimeError(f"Failed to communicate with Microsandbox server: {e}")
+
+            # Check the message - it might indicate the sandbox is still initializing
+            if isinstance(result, str) and "timed out waiting" in result:
+                # Server timed out but still started the sandbox
+                # We'll raise a warning but still consider it started
+                import warnings
+
+                warnings.warn(f"Sandbox start warning: {result}")
+
+            self._is_started = True
 
     async def stop(self) -> None:
         """
@@ -226,33 +524,14 @@ class BaseSandbox(ABC):
         Raises:
             RuntimeError: If the sandbox fails to stop
         """
-        if not self._is_started:
-            return
+        async with self._get_lifecycle_lock():
+            if not self._is_started:
+                return
 
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "sandbox.stop",
-            "params": {"sandbox": self._name},
-            "id": str(uuid.uuid4()),
-        }
-
-        headers = {"Content-Type": "application/json"}
-        if self._api_key:
-            headers["Authorization"] = f"Bearer {self._api_key}"
-
-        try:
-            async with self._session.post(
-                f"{self._server_url}/api/v1/sandbox/stop",
-                json=request_data,
-                headers=headers,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Failed to stop sandbox: {error_text}")
-
-                self._is_started = False
-        except aiohttp.ClientError as e:
-            raise RuntimeError(f"Failed to communicate with Microsandbox server: {e}")
+            await self._rpc(
+                "sandbox.stop", self._sandbox_params, "Failed to stop sandbox"
+            )
+            self._is_started = False
 
     @abstractmethod
     async def run(self, code: str):
@@ -288,4 +567,6 @@ class BaseSandbox(ABC):
         Returns:
             A Metrics instance bound to this sandbox
         """
-        return Metrics(self)
+        if self._metrics is None:
+            self._metrics = Metrics(self)
+        return self._metrics
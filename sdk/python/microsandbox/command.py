@@ -2,11 +2,8 @@
 Command execution interface for the Microsandbox Python SDK.
 """
 
-import uuid
 from typing import List, Optional
 
-import aiohttp
-
 from .command_execution import CommandExecution
 
 
@@ -44,51 +41,30 @@ class Command:
         Raises:
             RuntimeError: If the sandbox is not started or execution fails
         """
-        if not self._sandbox._is_started:
+        sandbox = self._sandbox
+        if not sandbox._is_started:
             raise RuntimeError("Sandbox is not started. Call start() first.")
 
         if args is None:
             args = []
 
-        headers = {"Content-Type": "application/json"}
-        if self._sandbox._api_key:
-            headers["Authorization"] = f"Bearer {self._sandbox._api_key}"
-
         # Prepare the request data
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "sandbox.command.run",
-            "params": {
-                "sandbox": self._sandbox._name,
-                "command": command,
-                "args": args,
-            },
-            "id": str(uuid.uuid4()),
+        params = {
+            "sandbox": sandbox._name,
+            "command": command,
+            "args": args,
         }
 
         # Add timeout if specified
         if timeout is not None:
-            request_data["params"]["timeout"] = timeout
-
-        try:
-            async with self._sandbox._session.post(
-                f"{self._sandbox._server_url}/api/v1/rpc",
-                json=request_data,
-                headers=headers,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Failed to execute command: {error_text}")
-
-                response_data = await response.json()
-                if "error" in response_data:
-                    raise RuntimeError(
-                        f"Failed to execute command: {response_data['error']['message']}"
-                    )
+            params["timeout"] = timeout
 
-                result = response_data.get("result", {})
+        result = await sandbox._rpc(
+            "sandbox.command.run",
+            params,
+            "Failed to execute command",
+            idempotent=sandbox._retry_runs,
+        )
 
-                # Create and return a CommandExecution object with the output data
-                return CommandExecution(output_data=result)
-        except aiohttp.ClientError as e:
-            raise RuntimeError(f"Failed to execute command: {e}")
+        # Create and return a CommandExecution object with the output data
+        return CommandExecution(output_data=result)
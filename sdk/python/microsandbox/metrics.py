@@ -2,7 +2,8 @@
 Metrics interface for the Microsandbox Python SDK.
 """
 
-import uuid
+import asyncio
+import time
 from typing import Optional
 
 
@@ -11,17 +12,71 @@ class Metrics:
     Metrics class for retrieving resource metrics for a sandbox.
 
     This class provides methods to access specific metrics (CPU, memory, disk)
-    for the sandbox instance it's attached to.
+    for the sandbox instance it's attached to. All accessors share a single
+    `sandbox.metrics.get` response that is cached for a short TTL, so reading
+    several fields back to back costs one round trip.
     """
 
-    def __init__(self, sandbox_instance):
+    def __init__(self, sandbox_instance, ttl: float = 0.25):
         """
         Initialize the metrics instance.
 
         Args:
             sandbox_instance: The sandbox instance this metrics object belongs to
+            ttl: How long, in seconds, a fetched metrics snapshot is reused (default: 0.25)
         """
         self._sandbox = sandbox_instance
+        self._ttl = ttl
+        self._cache: Optional[dict] = None
+        self._cache_ts = 0.0
+        self._pending: Optional[asyncio.Future] = None
+
+    async def _snapshot(self) -> dict:
+        """
+        Internal method to get the current metrics, reusing a recent response if possible.
+
+        Concurrent callers that miss the cache share a single in-flight request.
+
+        Returns:
+            A dictionary containing the metrics data for the sandbox
+
+        Raises:
+            RuntimeError: If the sandbox is not started or if the request fails
+        """
+        if (
+            self._cache is not None
+            and self._sandbox._is_started
+            and time.monotonic() - self._cache_ts < self._ttl
+        ):
+            return self._cache
+
+        if self._pending is None:
+            self._pending = asyncio.ensure_future(self._refresh())
+            # Mark a failure as retrieved even if every caller was cancelled meanwhile
+            self._pending.add_done_callback(
+                lambda future: future.cancelled() or future.exception()
+            )
+
+        # Shield the shared request so one cancelled caller doesn't cancel it for the others
+        return await asyncio.shield(self._pending)
+
+    async def _refresh(self) -> dict:
+        """
+        Internal method to fetch metrics from the server and update the cache.
+
+        Returns:
+            A dictionary containing the metrics data for the sandbox
+
+        Raises:
+            RuntimeError: If the sandbox is not started or if the request fails
+        """
+        try:
+            metrics = await self._get_metrics()
+            self._cache = metrics
+            self._cache_ts = time.monotonic()
+            return metrics
+        finally:
+            self._pending = None
 
     async def _get_metrics(self) -> dict:
         """
@@ -33,50 +88,37 @@ class Metrics:
         Raises:
             RuntimeError: If the request to the server fails
         """
-        if not self._sandbox._is_started:
+        sandbox = self._sandbox
+        if not sandbox._is_started:
             raise RuntimeError("Sandbox is not started. Call start() first.")
 
-        headers = {"Content-Type": "application/json"}
-        if self._sandbox._api_key:
-            headers["Authorization"] = f"Bearer {self._sandbox._api_key}"
+        result = await sandbox._rpc(
+            "sandbox.metrics.get",
+            sandbox._sandbox_params,
+            "Failed to get sandbox metrics",
+            idempotent=True,
+        )
+        sandboxes = result.get("sandboxes", [])
 
-        # Prepare the request data
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "sandbox.metrics.get",
-            "params": {
-                "sandbox": self._sandbox._name,
-            },
-            "id": str(uuid.uuid4()),
-        }
+        # We expect exactly one sandbox in the response (our own)
+        if not sandboxes:
+            return {}
 
-        try:
-            async with self._sandbox._session.post(
-                f"{self._sandbox._server_url}/api/v1/rpc",
-                json=request_data,
-                headers=headers,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Failed to get sandbox metrics: {error_text}")
-
-                response_data = await response.json()
-                if "error" in response_data:
-                    raise RuntimeError(
-                        f"Failed to get sandbox metrics: {response_data['error']['message']}"
-                    )
-
-                result = response_data.get("result", {})
-                sandboxes = result.get("sandboxes", [])
-
-                # We expect exactly one sandbox in the response (our own)
-                if not sandboxes:
-                    return {}
-
-                # Return the first (and should be only) sandbox data
-                return sandboxes[0]
-        except Exception as e:
-            raise RuntimeError(f"Failed to get sandbox metrics: {e}")
+        # Return the first (and should be only) sandbox data
+        return sandboxes[0]
+
+    async def refresh(self) -> dict:
+        """
+        Fetch fresh metrics from the server, discarding any cached snapshot.
+
+        Returns:
+            A dictionary containing all metrics for the sandbox, in the same format as all()
+
+        Raises:
+            RuntimeError: If the sandbox is not started or if the request fails
+        """
+        self._cache = None
+        return dict(await self._snapshot())
 
     async def all(self) -> dict:
         """
@@ -95,7 +137,7 @@ class Metrics:
         Raises:
             RuntimeError: If the sandbox is not started or if the request fails
         """
-        return await self._get_metrics()
+        return dict(await self._snapshot())
 
     async def cpu(self) -> Optional[float]:
         """
@@ -108,7 +150,7 @@ class Metrics:
         Raises:
             RuntimeError: If the sandbox is not started or if the request fails
         """
-        metrics = await self._get_metrics()
+        metrics = await self._snapshot()
         return metrics.get("cpu_usage")
 
     async def memory(self) -> Optional[int]:
@@ -121,7 +163,7 @@ class Metrics:
         Raises:
             RuntimeError: If the sandbox is not started or if the request fails
         """
-        metrics = await self._get_metrics()
+        metrics = await self._snapshot()
         return metrics.get("memory_usage")
 
     async def disk(self) -> Optional[int]:
@@ -134,7 +176,7 @@ class Metrics:
         Raises:
             RuntimeError: If the sandbox is not started or if the request fails
         """
-        metrics = await self._get_metrics()
+        metrics = await self._snapshot()
         return metrics.get("disk_usage")
 
     async def is_running(self) -> bool:
@@ -147,5 +189,5 @@ class Metrics:
         Raises:
             RuntimeError: If the request to the server fails
         """
-        metrics = await self._get_metrics()
+        metrics = await self._snapshot()
         return metrics.get("running", False)
@@ -0,0 +1,308 @@
+"""
+Pool of pre-started sandboxes for the Microsandbox Python SDK.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from . import _http
+from .base_sandbox import BaseSandbox
+
+# Delay in seconds before refilling the pool again after a sandbox failed to start
+_REFILL_RETRY_DELAY = 5.0
+
+
+class SandboxPool:
+    """
+    Pool of started sandboxes that are handed out and reused instead of being
+    created and torn down for every task.
+
+    The pool keeps at least `min_idle` sandboxes started in the background, so
+    acquiring one doesn't wait for the server to cold start it. Released sandboxes
+    go back to the pool as they are, including any REPL state and files left by
+    earlier runs; acquire with `fresh=True`, or release with `discard=True`, when
+    that matters.
+
+    Example:
+
+        async with SandboxPool(PythonSandbox, min_idle=2) as pool:
+            async with pool.sandbox() as sandbox:
+                await sandbox.run("print('hello')")
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], BaseSandbox],
+        min_idle: int = 2,
+        max_idle: int = 8,
+        idle_ttl: float = 300.0,
+        start_options: Optional[Dict[str, Any]] = None,
+    ):
+        """
+        Initialize a sandbox pool.
+
+        Args:
+            factory: Callable returning a new, unstarted sandbox, e.g. PythonSandbox or a lambda passing server_url and api_key
+            min_idle: Number of started sandboxes to keep ready (default: 2)
+            max_idle: Most idle sandboxes to keep; extra released sandboxes are stopped (default: 8)
+            idle_ttl: How long, in seconds, a sandbox may sit idle before it is stopped (default: 300)
+            start_options: Optional keyword arguments for each sandbox's start(), such as image or memory
+        """
+        self._factory = factory
+        self._min_idle = min_idle
+        self._max_idle = max(max_idle, min_idle)
+        self._idle_ttl = idle_ttl
+        self._start_options = start_options or {}
+        # Idle sandboxes and when they were released, most recently released last
+        self._idle: List[Tuple[BaseSandbox, float]] = []
+        self._starting = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._maintainer: Optional[asyncio.Task] = None
+        self._warmer: Optional[asyncio.Task] = None
+        # Fills and stops that must finish even if whoever awaits them is cancelled
+        self._background: Set[asyncio.Future] = set()
+        self._closed = False
+
+    async def __aenter__(self) -> "SandboxPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        """
+        Start the minimum number of idle sandboxes and keep the pool topped up.
+
+        If starting fails or is cancelled, the pool is closed.
+
+        Raises:
+            RuntimeError: If the pool is closed or a sandbox fails to start
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed.")
+        if self._maintainer is not None:
+            return
+
+        try:
+            await self._shielded(self._fill())
+        except BaseException:
+            # Don't leave the sandboxes that did start, or that an interrupted fill is
+            # still starting, running with nobody to stop them
+            await self.close()
+            raise
+
+        # Pooled sandboxes are used concurrently, so open a connection for each of
+        # them ahead of time
+        if self._idle:
+            sandbox = self._idle[0][0]
+            self._warmer = asyncio.ensure_future(
+                _http.warm_up(sandbox._session, sandbox._server_url, self._max_idle)
+            )
+        self._wakeup = asyncio.Event()
+        self._maintainer = asyncio.ensure_future(self._maintain())
+
+    async def close(self) -> None:
+        """
+        Stop all idle sandboxes and the background refill.
+
+        Sandboxes that are still acquired are stopped when they are released.
+        """
+        self._closed = True
+        if self._warmer is not None:
+            self._warmer.cancel()
+            self._warmer = None
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            try:
+                await self._maintainer
+            except asyncio.CancelledError:
+                pass
+            self._maintainer = None
+
+        # Let interrupted fills finish; the sandboxes they start are stopped on release
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+        idle, self._idle = self._idle, []
+        await asyncio.gather(
+            *(self._stop(sandbox) for sandbox, _ in idle), return_exceptions=True
+        )
+
+    async def acquire(self, fresh: bool = False) -> BaseSandbox:
+        """
+        Get a started sandbox from the pool, starting a new one if none are idle.
+
+        Args:
+            fresh: Whether to start a new sandbox instead of reusing an idle one
+
+        Returns:
+            A started sandbox, to be handed back with release()
+
+        Raises:
+            RuntimeError: If the pool is closed or a new sandbox fails to start
+            TimeoutError: If a new sandbox doesn't start in time
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed.")
+
+        # Top the pool back up in the background
+        self._wake()
+        if not fresh and self._idle:
+            sandbox, _ = self._idle.pop()
+            return sandbox
+
+        return await self._new_sandbox()
+
+    async def release(self, sandbox: BaseSandbox, discard: bool = False) -> None:
+        """
+        Hand a sandbox back to the pool.
+
+        Args:
+            sandbox: A sandbox obtained from acquire()
+            discard: Whether to stop the sandbox instead of keeping it for reuse
+        """
+        if (
+            discard
+            or self._closed
+            or not sandbox._is_started
+            or len(self._idle) >= self._max_idle
+        ):
+            await self._stop(sandbox)
+            return
+
+        self._idle.append((sandbox, time.monotonic()))
+
+    @asynccontextmanager
+    async def sandbox(self, fresh: bool = False):
+        """
+        Acquire a sandbox as an async context manager, releasing it on exit.
+
+        Args:
+            fresh: Whether to start a new sandbox instead of reusing an idle one
+
+        Returns:
+            A started sandbox
+        """
+        sandbox = await self.acquire(fresh=fresh)
+        try:
+            yield sandbox
+        finally:
+            await self.release(sandbox)
+
+    async def _new_sandbox(self) -> BaseSandbox:
+        """
+        Create and start a new sandbox.
+
+        Returns:
+            The started sandbox
+
+        Raises:
+            RuntimeError: If the sandbox fails to start
+            TimeoutError: If the sandbox doesn't start in time
+        """
+        sandbox = self._factory()
+        sandbox._acquire_session()
+        try:
+            await sandbox.start(**self._start_options)
+        except BaseException:
+            await sandbox._release_session()
+            raise
+        return sandbox
+
+    async def _stop(self, sandbox: BaseSandbox) -> None:
+        """
+        Stop a sandbox and release its HTTP session.
+
+        Args:
+            sandbox: The sandbox to stop
+        """
+        try:
+            await sandbox.stop()
+        finally:
+            await sandbox._release_session()
+
+    async def _fill(self) -> None:
+        """
+        Start sandboxes concurrently until the pool has the minimum number idle.
+
+        Raises:
+            RuntimeError: If a sandbox fails to start
+        """
+        missing = self._min_idle - len(self._idle) - self._starting
+        if missing <= 0:
+            return
+
+        self._starting += missing
+        try:
+            results = await asyncio.gather(
+                *(self._new_sandbox() for _ in range(missing)), return_exceptions=True
+            )
+        finally:
+            self._starting -= missing
+
+        errors = []
+        for result in results:
+            if isinstance(result, BaseException):
+                errors.append(result)
+            else:
+                await self.release(result)
+        if errors:
+            raise errors[0]
+
+    async def _shielded(self, operation: Awaitable[Any]) -> Any:
+        """
+        Run an operation that keeps going, and is awaited by close(), even if the
+        caller is cancelled.
+
+        Args:
+            operation: The operation to run
+
+        Returns:
+            The result of the operation
+        """
+        future = asyncio.ensure_future(operation)
+        self._background.add(future)
+        future.add_done_callback(self._background.discard)
+        return await asyncio.shield(future)
+
+    def _wake(self) -> None:
+        """
+        Ask the background task to top the pool up.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _maintain(self) -> None:
+        """
+        Background task that refills the pool and stops sandboxes idle for too long.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._idle_ttl)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            # Stop sandboxes that have been idle for too long, oldest first, while
+            # keeping the minimum number ready
+            cutoff = time.monotonic() - self._idle_ttl
+            expired = []
+            while len(self._idle) > self._min_idle and self._idle[0][1] < cutoff:
+                expired.append(self._idle.pop(0)[0])
+            if expired:
+                await self._shielded(
+                    asyncio.gather(
+                        *(self._stop(sandbox) for sandbox in expired),
+                        return_exceptions=True,
+                    )
+                )
+
+            try:
+                await self._shielded(self._fill())
+            except Exception:
+                # Acquiring still starts sandboxes on demand; try again later
+                await asyncio.sleep(_REFILL_RETRY_DELAY)
+                self._wake()
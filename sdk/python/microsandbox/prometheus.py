@@ -0,0 +1,114 @@
+"""
+Prometheus metrics for the RPCs made by the Microsandbox Python SDK.
+
+Requires the prometheus_client package, available with the `prometheus` extra:
+
+    pip install "microsandbox[prometheus]"
+
+Example:
+
+    from microsandbox import set_rpc_observer
+    from microsandbox.prometheus import prometheus_observer
+
+    set_rpc_observer(prometheus_observer())
+"""
+
+from typing import Any, Dict
+
+from ._observer import RpcObserver
+
+# Request durations in seconds, from sub-millisecond local calls to slow sandbox starts
+_DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+# Request and response body sizes in bytes, up to the largest response accepted
+_SIZE_BUCKETS = tuple(256 * 4**i for i in range(10))
+
+
+def prometheus_observer(registry=None, namespace: str = "microsandbox") -> RpcObserver:
+    """
+    Create an RPC observer that records Prometheus metrics.
+
+    The observer records, labelled by JSON-RPC method:
+    - `<namespace>_rpc_duration_seconds`: histogram of request durations
+    - `<namespace>_rpc_request_bytes`: histogram of request body sizes
+    - `<namespace>_rpc_response_bytes`: histogram of response body sizes
+    - `<namespace>_rpc_errors_total`: counter of failed requests, also labelled by
+      HTTP status and JSON-RPC error code
+
+    Args:
+        registry: Registry to register the metrics with. If not provided, the default
+            prometheus_client registry is used.
+        namespace: Prefix for the metric names
+
+    Returns:
+        An observer to pass to set_rpc_observer()
+
+    Raises:
+        ImportError: If prometheus_client is not installed
+    """
+    try:
+        from prometheus_client import REGISTRY, Counter, Histogram
+    except ImportError as e:
+        raise ImportError(
+            "prometheus_client is required for Prometheus metrics. "
+            'Install it with: pip install "microsandbox[prometheus]"'
+        ) from e
+
+    if registry is None:
+        registry = REGISTRY
+
+    duration = Histogram(
+        f"{namespace}_rpc_duration_seconds",
+        "Duration of Microsandbox RPC requests",
+        ["method"],
+        buckets=_DURATION_BUCKETS,
+        registry=registry,
+    )
+    request_size = Histogram(
+        f"{namespace}_rpc_request_bytes",
+        "Size of Microsandbox RPC request bodies",
+        ["method"],
+        buckets=_SIZE_BUCKETS,
+        registry=registry,
+    )
+    response_size = Histogram(
+        f"{namespace}_rpc_response_bytes",
+        "Size of Microsandbox RPC response bodies",
+        ["method"],
+        buckets=_SIZE_BUCKETS,
+        registry=registry,
+    )
+    errors = Counter(
+        f"{namespace}_rpc_errors",
+        "Failed Microsandbox RPC requests",
+        ["method", "status", "code"],
+        registry=registry,
+    )
+
+    def observe(event: Dict[str, Any]) -> None:
+        method = event["method"]
+        duration.labels(method).observe(event["dur"])
+        request_size.labels(method).observe(event["req_bytes"])
+        response_size.labels(method).observe(event["resp_bytes"])
+
+        status = event["status"]
+        code = event["rpc_error"]
+        if status != 200 or code is not None:
+            errors.labels(method, str(status or ""), str(code or "")).inc()
+
+    return observe
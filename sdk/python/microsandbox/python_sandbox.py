@@ -2,10 +2,6 @@
 Python-specific sandbox implementation for the Microsandbox Python SDK.
 """
 
-import uuid
-
-import aiohttp
-
 from .base_sandbox import BaseSandbox
 from .execution import Execution
 
@@ -15,7 +11,8 @@ class PythonSandbox(BaseSandbox):
     Python-specific sandbox for executing Python code.
     """
 
-    async def get_default_image(self) -> str:
+    @classmethod
+    def get_default_image(cls) -> str:
         """
         Get the default Docker image for Python sandbox.
 
@@ -37,43 +34,4 @@ class PythonSandbox(BaseSandbox):
         Raises:
             RuntimeError: If the sandbox is not started or execution fails
         """
-        if not self._is_started:
-            raise RuntimeError("Sandbox is not started. Call start() first.")
-
-        headers = {"Content-Type": "application/json"}
-        if self._api_key:
-            headers["Authorization"] = f"Bearer {self._api_key}"
-
-        request_data = {
-            "jsonrpc": "2.0",
-            "method": "sandbox.repl.run",
-            "params": {
-                "sandbox": self._name,
-                "language": "python",
-                "code": code,
-            },
-            "id": str(uuid.uuid4()),
-        }
-
-        try:
-            async with self._session.post(
-                f"{self._server_url}/api/v1/rpc",
-                json=request_data,
-                headers=headers,
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise RuntimeError(f"Failed to execute code: {error_text}")
-
-                response_data = await response.json()
-                if "error" in response_data:
-                    raise RuntimeError(
-                        f"Failed to execute code: {response_data['error']['message']}"
-                    )
-
-                result = response_data.get("result", {})
-
-                # Create and return an Execution object with the output data
-                return Execution(output_data=result)
-        except aiohttp.ClientError as e:
-            raise RuntimeError(f"Failed to execute code: {e}")
+        return await self._run_repl("python", code)